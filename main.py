@@ -1,13 +1,58 @@
+import asyncio
+import hashlib
+import html
+from functools import partial
+from collections import OrderedDict
+from enum import IntEnum
 from typing import Optional, Dict, Any
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.middleware.cors import CORSMiddleware
-import json
+from fastapi.middleware.gzip import GZipMiddleware
 import time
+from pydantic import HttpUrl, TypeAdapter, ValidationError
 from streamfeed import preview_feed
-from urllib.parse import urlparse
 
-app = FastAPI()
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+    import json
+
+
+def dump_json(data: Any, pretty: bool = False) -> bytes:
+    """Serialize data to JSON bytes, using orjson when it is available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+    ).encode("utf-8")
+
+
+def load_json(raw: bytes) -> Any:
+    """Parse JSON bytes, using orjson when it is available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (or the stdlib fallback)."""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -18,151 +63,240 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory cache
-cache: Dict[str, Dict[str, Any]] = {}
+# Compress the HTML page and feed JSON, both of which shrink well
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+
+class FeedSize(IntEnum):
+    """Number of feed items that can be previewed."""
+
+    ONE = 1
+    FIVE = 5
+    TEN = 10
+    TWENTY = 20
+
+
+# Simple in-memory LRU cache, bounded so long-lived workers don't grow forever
+cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
 CACHE_TTL = 300  # 5 minutes
+CACHE_MAX_ENTRIES = 1024
+FAILURE_CACHE_TTL = 30  # Failed fetches are retried sooner than good ones
+BROWSER_MAX_AGE = 60  # Browsers recheck sooner than shared caches (CDNs)
+
+# Shared feed_logic for requests without options, streamfeed only reads it
+_EMPTY_LOGIC: Dict[str, Any] = {}
+
+# Validates and normalizes URLs the same way FastAPI does for HttpUrl params
+_HTTP_URL = TypeAdapter(HttpUrl)
 
+# Fetches currently in progress, so concurrent misses share one upstream request
+inflight: Dict[bytes, "asyncio.Task[Dict[str, Any]]"] = {}
 
-def is_valid_url(url: str) -> bool:
-    """Validate if the provided string is a proper URL."""
+
+def normalize_url(url: str) -> Optional[str]:
+    """Normalize a URL like /preview's HttpUrl param, or None if it's invalid."""
     try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc]) and result.scheme in [
-            "http",
-            "https",
-        ]
-    except:
-        return False
+        return str(_HTTP_URL.validate_python(url))
+    except ValidationError:
+        return None
 
 
-def get_cached_feed(cache_key: str) -> Optional[Dict[str, Any]]:
-    """Get feed from cache if it exists and is not expired."""
-    if cache_key in cache:
-        entry = cache[cache_key]
-        if time.time() - entry["timestamp"] < CACHE_TTL:
-            return entry["data"]
-    return None
+def make_feed_logic(xml_item_tag: Optional[str]) -> Dict[str, Any]:
+    """Build the streamfeed feed_logic options for a request."""
+    return {"xml_item_tag": xml_item_tag} if xml_item_tag else _EMPTY_LOGIC
 
 
-def cache_feed(cache_key: str, data: Dict[str, Any]):
-    """Store feed data in cache."""
-    cache[cache_key] = {"data": data, "timestamp": time.time()}
+def make_cache_key(url: str, size: int, xml_item_tag: Optional[str]) -> bytes:
+    """Hash the request parameters into a short, fixed-size cache key."""
+    params = repr((url, size, xml_item_tag)).encode("utf-8")
+    return hashlib.blake2b(params, digest_size=16).digest()
 
 
-@app.get("/", response_class=HTMLResponse)
-def pretty_preview(
-    url: Optional[str] = None,
-    size: int = Query(1, enum=[1, 5, 10, 20]),
-    xml_item_tag: Optional[str] = None,
-):
-    feed_content = ""
-    error_message = ""
-
-    # If a URL is provided, try to load the feed
-    if url:
-        # Validate URL format
-        if not is_valid_url(url):
-            error_message = (
-                "Invalid URL format. Please provide a valid HTTP or HTTPS URL."
-            )
-        else:
-            feed_logic = {"xml_item_tag": xml_item_tag} if xml_item_tag else {}
-            cache_key = f"{url}:{size}:{xml_item_tag}"
-
-            # Try to get from cache first
-            cached_result = get_cached_feed(cache_key)
-            if cached_result:
-                feed_content = json.dumps(cached_result, indent=4)
-            else:
-                try:
-                    data = preview_feed(url=url, feed_logic=feed_logic, limit_rows=size)
-                    # Cache the result
-                    cache_feed(cache_key, data)
-                    # Convert the feed data to pretty-printed JSON format
-                    feed_content = json.dumps(data, indent=4)
-                except Exception as e:
-                    error_message = f"Error fetching feed: {str(e)}"
-
-    # Prepare the conditional parts of the HTML
-    url_value = url or ""
-    size_1_selected = "selected" if size == 1 else ""
-    size_5_selected = "selected" if size == 5 else ""
-    size_10_selected = "selected" if size == 10 else ""
-    size_20_selected = "selected" if size == 20 else ""
-    xml_tag_value = xml_item_tag or ""
-
-    error_html = (
-        f"<div class='error'>Error: {error_message}</div>" if error_message else ""
-    )
-    feed_html = (
-        f"<div class='output'><h2>Feed Output</h2><pre>{feed_content}</pre></div>"
-        if feed_content
-        else ""
+def get_cached_feed(cache_key: bytes) -> Optional[Dict[str, Any]]:
+    """Get the cached feed entry if it exists and is not expired."""
+    entry = cache.get(cache_key)
+    if entry is None:
+        return None
+    if time.monotonic() - entry["timestamp"] >= entry["ttl"]:
+        # Drop expired entries eagerly instead of letting them linger
+        del cache[cache_key]
+        return None
+    cache.move_to_end(cache_key)
+    return entry
+
+
+def store_entry(cache_key: bytes, entry: Dict[str, Any]):
+    """Insert a cache entry, evicting the least recently used ones if full."""
+    cache[cache_key] = entry
+    cache.move_to_end(cache_key)
+    while len(cache) > CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+
+def cache_feed(cache_key: bytes, data: Any) -> Dict[str, Any]:
+    """Serialize feed data, store it in cache and return the new entry."""
+    # preview_feed swallows fetch errors and returns an empty list instead of
+    # raising, so an empty result is kept only as long as a failure would be
+    # and is never handed to shared caches
+    ok = bool(data)
+    feed_json = dump_json(data)
+    # Weak, since GZipMiddleware serves the same ETag for other content-codings
+    etag = 'W/"' + hashlib.blake2b(feed_json, digest_size=8).hexdigest() + '"'
+    entry = {
+        "json": feed_json,
+        "etag": etag,
+        "timestamp": time.monotonic(),
+        "ttl": CACHE_TTL if ok else FAILURE_CACHE_TTL,
+        "public": ok,
+    }
+    store_entry(cache_key, entry)
+    return entry
+
+
+def feed_html(entry: Dict[str, Any]) -> str:
+    """Get the indented, HTML-escaped feed JSON for the preview page."""
+    # Built on the first page view and kept on the entry, so entries only
+    # read through /preview never pay for the indented form
+    pretty_html = entry.get("pretty_html")
+    if pretty_html is None:
+        pretty = dump_json(load_json(entry["json"]), pretty=True).decode("utf-8")
+        pretty_html = entry["pretty_html"] = html.escape(pretty)
+    return pretty_html
+
+
+def cache_failure(cache_key: bytes, error: str, ttl: int = FAILURE_CACHE_TTL):
+    """Remember a failed fetch so repeated requests don't hit the upstream."""
+    entry = {"error": error, "timestamp": time.monotonic(), "ttl": ttl}
+    store_entry(cache_key, entry)
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the client's If-None-Match header weakly matches the ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def cache_headers(entry: Dict[str, Any], etag: Optional[str] = None) -> Dict[str, str]:
+    """Build the HTTP caching headers for a cached feed entry."""
+    etag = etag or entry["etag"]
+    if not entry["public"]:
+        return {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # Let shared caches keep the response only for what is left of our TTL
+    age = time.monotonic() - entry["timestamp"]
+    remaining = max(0, int(entry["ttl"] - age))
+    cache_control = (
+        f"public, s-maxage={remaining}, max-age={min(BROWSER_MAX_AGE, remaining)}"
     )
+    return {"ETag": etag, "Cache-Control": cache_control}
+
 
-    # Construct the HTML page with a form and a section for output/error messages.
-    html_content = f"""
+async def _fetch_and_cache(
+    cache_key: bytes, url: str, feed_logic: Dict[str, Any], size: int
+) -> Dict[str, Any]:
+    try:
+        # preview_feed blocks on the network, keep it off the event loop
+        data = await run_in_threadpool(
+            preview_feed, url=url, feed_logic=feed_logic, limit_rows=size
+        )
+    except Exception as e:
+        cache_failure(cache_key, f"Error fetching feed: {str(e)}")
+        raise
+    return cache_feed(cache_key, data)
+
+
+def _forget_inflight(cache_key: bytes, task: "asyncio.Task[Dict[str, Any]]"):
+    if inflight.get(cache_key) is task:
+        del inflight[cache_key]
+    if not task.cancelled():
+        # Mark the exception as retrieved in case every waiter went away
+        task.exception()
+
+
+async def fetch_feed(
+    cache_key: bytes, url: str, feed_logic: Dict[str, Any], size: int
+) -> Dict[str, Any]:
+    """Fetch and cache a feed, joining any fetch already running for the key."""
+    task = inflight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(
+            _fetch_and_cache(cache_key, url, feed_logic, size)
+        )
+        inflight[cache_key] = task
+        task.add_done_callback(partial(_forget_inflight, cache_key))
+    # Shield the shared fetch so one client disconnecting doesn't cancel it
+    # for everyone else waiting on the same key
+    return await asyncio.shield(task)
+
+
+# The page chrome never changes between requests, so it is built once at
+# import time and only the form/output fragment is formatted per request.
+HTML_HEAD = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Feed Preview</title>
     <meta charset="utf-8" />
     <style>
-        body {{
+        body {
             font-family: Arial, sans-serif;
             background-color: #f5f5f5;
             margin: 0;
             padding: 20px;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 800px;
             margin: auto;
             background: #fff;
             padding: 20px;
             border-radius: 5px;
             box-shadow: 0 0 10px rgba(0,0,0,0.1);
-        }}
-        h1 {{
+        }
+        h1 {
             text-align: center;
-        }}
-        .description {{
+        }
+        .description {
             background-color: #e9f7ef;
             border-left: 4px solid #2ecc71;
             padding: 15px;
             margin-bottom: 20px;
             font-size: 0.95em;
-        }}
-        .description a {{
+        }
+        .description a {
             color: #007BFF;
             text-decoration: none;
-        }}
-        .description a:hover {{
+        }
+        .description a:hover {
             text-decoration: underline;
-        }}
-        .form-group {{
+        }
+        .form-group {
             margin-bottom: 15px;
-        }}
-        label {{
+        }
+        label {
             display: block;
             margin-bottom: 5px;
-        }}
-        input[type="text"], select {{
+        }
+        input[type="text"], select {
             width: 100%;
             padding: 8px;
             box-sizing: border-box;
-        }}
-        input[type="submit"] {{
+        }
+        input[type="submit"] {
             padding: 10px 20px;
             background-color: #007BFF;
             color: #fff;
             border: none;
             border-radius: 5px;
             cursor: pointer;
-        }}
-        input[type="submit"]:hover {{
+        }
+        input[type="submit"]:hover {
             background-color: #0056b3;
-        }}
-        .output {{
+        }
+        .output {
             white-space: pre-wrap;
             background: #eee;
             padding: 10px;
@@ -170,12 +304,12 @@ def pretty_preview(
             border-radius: 5px;
             margin-top: 20px;
             overflow-x: auto;
-        }}
-        .error {{
+        }
+        .error {
             color: red;
             font-weight: bold;
             margin-top: 20px;
-        }}
+        }
     </style>
 </head>
 <body>
@@ -186,7 +320,9 @@ def pretty_preview(
             <a href="https://github.com/devwithhans/streamfeed-parser?tab=readme-ov-file" target="_blank">GitHub</a> or view it on 
             <a href="https://pypi.org/project/streamfeed-parser/" target="_blank">PyPI</a>.
         </div>
-        <form action="/" method="get">
+"""
+
+HTML_FORM = """        <form action="/" method="get">
             <div class="form-group">
                 <label for="url">Feed URL:</label>
                 <input type="text" id="url" name="url" placeholder="Enter Feed URL" value="{url_value}" required>
@@ -206,40 +342,140 @@ def pretty_preview(
             </div>
             <input type="submit" value="Preview Feed">
         </form>
-        {error_html}
-        {feed_html}
-    </div>
+"""
+
+HTML_TAIL = """    </div>
 </body>
 </html>
 """
-    return HTMLResponse(content=html_content)
+
+
+def render_form(url: Optional[str], size: int, xml_item_tag: Optional[str]) -> str:
+    """Render the feed form, pre-filled with the current query."""
+    return HTML_FORM.format_map(
+        {
+            "url_value": html.escape(url or ""),
+            "size_1_selected": "selected" if size == 1 else "",
+            "size_5_selected": "selected" if size == 5 else "",
+            "size_10_selected": "selected" if size == 10 else "",
+            "size_20_selected": "selected" if size == 20 else "",
+            "xml_tag_value": html.escape(xml_item_tag or ""),
+        }
+    )
+
+
+def render_output(pretty_html: str = "", error_message: str = "") -> str:
+    """Render the feed output (already escaped) or error section of the page."""
+    if error_message:
+        error_message = html.escape(error_message)
+        return f"        <div class='error'>Error: {error_message}</div>\n"
+    return (
+        "        <div class='output'><h2>Feed Output</h2>"
+        f"<pre>{pretty_html}</pre></div>\n"
+    )
+
+
+# Mixed into the page's ETag so a deploy that changes the markup invalidates
+# pages clients already hold
+HTML_VERSION = hashlib.blake2b(
+    (HTML_HEAD + HTML_FORM + HTML_TAIL + render_output()).encode("utf-8"),
+    digest_size=4,
+).hexdigest()
+
+
+def html_etag(entry: Dict[str, Any]) -> str:
+    """ETag for the HTML page, covering both the feed and the page markup."""
+    return entry["etag"][:-1] + f'-{HTML_VERSION}"'
+
+
+@app.get("/", response_class=HTMLResponse)
+async def pretty_preview(
+    request: Request,
+    url: Optional[str] = None,
+    size: FeedSize = Query(FeedSize.ONE),
+    xml_item_tag: Optional[str] = None,
+):
+    page_head = HTML_HEAD + render_form(url, size, xml_item_tag)
+
+    # Without a URL there is nothing to load, just show the form
+    if not url:
+        return HTMLResponse(content=page_head + HTML_TAIL)
+
+    # Fetch and cache by the normalized URL so / and /preview share entries
+    feed_url = normalize_url(url)
+    if feed_url is None:
+        error_html = render_output(
+            error_message=(
+                "Invalid URL format. Please provide a valid HTTP or HTTPS URL."
+            )
+        )
+        return HTMLResponse(content=page_head + error_html + HTML_TAIL)
+
+    feed_logic = make_feed_logic(xml_item_tag)
+    cache_key = make_cache_key(feed_url, size, xml_item_tag)
+
+    # Try to get from cache first
+    entry = get_cached_feed(cache_key)
+    if entry is not None and "error" in entry:
+        error_html = render_output(error_message=entry["error"])
+        return HTMLResponse(content=page_head + error_html + HTML_TAIL)
+    if entry is not None:
+        etag = html_etag(entry)
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers(entry, etag))
+        return HTMLResponse(
+            content=page_head + render_output(feed_html(entry)) + HTML_TAIL,
+            headers=cache_headers(entry, etag),
+        )
+
+    # On a miss, send the page chrome and form right away and stream the
+    # output section once the feed has been fetched
+    async def stream_page():
+        yield page_head
+        try:
+            entry = await fetch_feed(cache_key, feed_url, feed_logic, size)
+        except Exception as e:
+            yield render_output(error_message=f"Error fetching feed: {str(e)}")
+        else:
+            yield render_output(feed_html(entry))
+        yield HTML_TAIL
+
+    return StreamingResponse(stream_page(), media_type="text/html")
 
 
 # Original preview endpoint that returns raw JSON
 @app.get("/preview")
-def preview_feed_endpoint(
-    url: str,
-    size: int = Query(1, enum=[1, 5, 10, 20]),
+async def preview_feed_endpoint(
+    request: Request,
+    url: HttpUrl,
+    size: FeedSize = Query(FeedSize.ONE),
     xml_item_tag: Optional[str] = None,
 ):
-    # Validate URL format
-    if not is_valid_url(url):
-        raise HTTPException(status_code=400, detail="Invalid URL format")
-
-    feed_logic = {"xml_item_tag": xml_item_tag} if xml_item_tag else {}
-    cache_key = f"{url}:{size}:{xml_item_tag}"
+    # The URL has already been validated as http(s) by pydantic
+    feed_url = str(url)
+    feed_logic = make_feed_logic(xml_item_tag)
+    cache_key = make_cache_key(feed_url, size, xml_item_tag)
 
     # Try to get from cache first
-    cached_result = get_cached_feed(cache_key)
-    if cached_result:
-        return cached_result
+    entry = get_cached_feed(cache_key)
+    if entry is not None and "error" in entry:
+        raise HTTPException(status_code=500, detail=entry["error"])
+    if entry is None:
+        try:
+            entry = await fetch_feed(cache_key, feed_url, feed_logic, size)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error fetching feed: {str(e)}"
+            )
 
-    try:
-        data = preview_feed(url=url, feed_logic=feed_logic, limit_rows=size)
-        cache_feed(cache_key, data)
-        return data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching feed: {str(e)}")
+    if is_not_modified(request, entry["etag"]):
+        return Response(status_code=304, headers=cache_headers(entry))
+
+    return Response(
+        content=entry["json"],
+        media_type="application/json",
+        headers=cache_headers(entry),
+    )
 
 
 # Health check endpoint.